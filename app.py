@@ -1,7 +1,13 @@
+import hashlib
+import io
+
 import streamlit as st
 import pandas as pd
 import numpy as np
 import plotly.express as px
+import plotly.graph_objects as go
+import pyarrow as pa
+import pyarrow.csv as pv
 
 # --- CONFIG ---
 st.set_page_config(page_title="House & Conduct Points Analysis", layout="wide")
@@ -14,253 +20,398 @@ HOUSE_MAPPING = {"B": "Brunel", "L": "Liddell", "D": "Dickens", "W": "Wilberforc
 HOUSE_COLORS = {"Brunel": "#FF0000", "Dickens": "#0000FF", "Liddell": "#FFD700", "Wilberforce": "#800080"}
 HOUSE_DOT = {"Brunel": "🔴", "Dickens": "🔵", "Liddell": "🟡", "Wilberforce": "🟣"}
 HOUSE_NAMES = list(HOUSE_COLORS.keys())
+HOUSE_BUCKET, CONDUCT_BUCKET = 1, 2
+MAX_BARS = 50
 
 # --- SIDEBAR ---
-with st.sidebar:
+with st.sidebar.form("settings"):
     target_input = st.number_input("Weekly House Points Target", min_value=1, value=DEFAULT_WEEKLY_TARGET, step=1)
+    render_charts = st.checkbox("Render charts", value=True)
+    st.form_submit_button("Apply")
 
 # --- EMBEDDED STAFF LIST ---
-PERMANENT_STAFF = pd.DataFrame({
-    "Teacher": sorted([
-        'ACA','AFO','AHU','AJL','AMA','AMD','APE','AZ','BJH','BW','CAH','CB','CD','CDE','CHO','CL','CLT','CSD','CST',
-        'CUG','DBE','DE','DHY','DLE','DO','DOD','DOL','DRO','DS','DSI','DYH','EFK','EM','EN','EP','EPO','EWH','FA',
-        'FRO','GM','GP','HW','IMO','JBR','JCH','JDA','JFA','JHO','JJO','JMA','JMO','JMU','JP','JS','JSA','JSI',
-        'KPR','KZI','LBL','LGS','LH','LHO','LJO','LTA','LTH','LVI','MBR','MH','MJ','MLO','MO','MP','MPA','MPN','MPU',
-        'NIQ','NPE','NR','NWI','OE','OTH','PHA','POT','PWH','RA','RC','RCO','RLP','RMA','SAB','SBA','SBR','SEE','SH',
-        'SPE','SXS','TFU','TNE','TP','TQ','TRA','VM','VSB','VT','WA','WTM'
-    ])
-})
+# built once per server process and shared read-only across sessions and reruns
+@st.cache_resource
+def get_permanent_staff():
+    return pd.DataFrame({
+        "Teacher": sorted([
+            'ACA','AFO','AHU','AJL','AMA','AMD','APE','AZ','BJH','BW','CAH','CB','CD','CDE','CHO','CL','CLT','CSD','CST',
+            'CUG','DBE','DE','DHY','DLE','DO','DOD','DOL','DRO','DS','DSI','DYH','EFK','EM','EN','EP','EPO','EWH','FA',
+            'FRO','GM','GP','HW','IMO','JBR','JCH','JDA','JFA','JHO','JJO','JMA','JMO','JMU','JP','JS','JSA','JSI',
+            'KPR','KZI','LBL','LGS','LH','LHO','LJO','LTA','LTH','LVI','MBR','MH','MJ','MLO','MO','MP','MPA','MPN','MPU',
+            'NIQ','NPE','NR','NWI','OE','OTH','PHA','POT','PWH','RA','RC','RCO','RLP','RMA','SAB','SBA','SBR','SEE','SH',
+            'SPE','SXS','TFU','TNE','TP','TQ','TRA','VM','VSB','VT','WA','WTM'
+        ])
+    })
+
+PERMANENT_STAFF = get_permanent_staff()
 
 # --- FILE UPLOAD ---
 uploaded_file = st.file_uploader("Upload weekly CSV file", type=["csv"])
 
 # --- DATA CLEANING ---
-def load_and_clean(file):
-    df = pd.read_csv(file)
-    df.columns = df.columns.str.strip()
+def read_csv_as_text(file_bytes, names, usecols):
+    # every column is cleaned as text afterwards, so skip type inference entirely
+    try:
+        table = pv.read_csv(
+            io.BytesIO(file_bytes),
+            read_options=pv.ReadOptions(column_names=names, skip_rows=1),
+            parse_options=pv.ParseOptions(newlines_in_values=True),
+            convert_options=pv.ConvertOptions(
+                include_columns=usecols,
+                column_types={col: pa.string() for col in usecols},
+                strings_can_be_null=True,
+            ),
+        )
+        return table.to_pandas(types_mapper={pa.string(): pd.StringDtype("pyarrow")}.get)
+    except pa.ArrowInvalid:
+        # pyarrow rejects ragged rows that the pandas parser pads with NaN
+        return pd.read_csv(io.BytesIO(file_bytes), header=0, names=names, usecols=usecols, dtype="string[pyarrow]")
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_and_clean(file_bytes: bytes):
     expected_columns = [
         "Pupil Name","House","Form","Year","Reward","Category",
         "Points","Date","Reward Description","Teacher","Dep","Subject"
     ]
-    if len(df.columns) >= len(expected_columns):
-        df.columns = expected_columns
+    # Date, Reward Description and Subject are never used, so the parser skips them
+    used_columns = ["Pupil Name","House","Form","Year","Reward","Category","Points","Teacher","Dep"]
+    header = pd.read_csv(io.BytesIO(file_bytes), nrows=0).columns.tolist()
+    if len(header) >= len(expected_columns):
+        # map by position; any trailing extra columns are skipped
+        names = expected_columns + [f"_extra_{i}" for i in range(len(header) - len(expected_columns))]
+        df = read_csv_as_text(file_bytes, names, used_columns)
     else:
-        for col in expected_columns:
+        df = read_csv_as_text(file_bytes, header, [h for h in header if h.strip() in used_columns])
+        df.columns = df.columns.str.strip()
+        for col in used_columns:
             if col not in df.columns:
-                df[col] = ""
-
-    df["Teacher"] = df["Teacher"].astype(str).str.strip().replace("", "Unknown")
-    df["Dep"] = df["Dep"].astype(str).str.strip()
-    df["Reward"] = df["Reward"].astype(str).str.strip().str.lower()
-    df["Category"] = df["Category"].astype(str).str.strip().str.lower()
-    df["Points"] = pd.to_numeric(df["Points"], errors="coerce").fillna(0).astype(int)
-    df["House"] = df["House"].astype(str).str.strip().str.upper().map(HOUSE_MAPPING)
-    df["Form"] = df["Form"].astype(str).str.strip().str.upper()
-    df["Year"] = df["Year"].astype(str).str.strip()
+                df[col] = pd.Series("", index=df.index, dtype="string[pyarrow]")
+
+    # int64 like the original astype(int): a narrower type would wrap a stray huge value into a negative total
+    df["Points"] = pd.to_numeric(df["Points"], errors="coerce").to_numpy(dtype="int64", na_value=0)
+    # key columns are cleaned once per distinct value and come back as categoricals for groupby;
+    # Pupil Name stays the reader's Arrow string column
+    df["Teacher"] = recode_categories(df["Teacher"], lambda t: t.strip() or "Unknown")
+    df["Dep"] = recode_categories(df["Dep"], str.strip)
+    df["Reward"] = recode_categories(df["Reward"], lambda r: r.strip().lower())
+    df["Category"] = recode_categories(df["Category"], lambda c: c.strip().lower())
+    df["House"] = recode_categories(df["House"], lambda h: HOUSE_MAPPING.get(h.strip().upper()), HOUSE_NAMES)
+    df["Form"] = recode_categories(df["Form"], lambda f: f.strip().upper())
+    df["Year"] = recode_categories(df["Year"], str.strip)
+    # independent bit flags: a reward naming both kinds lands in both tables
+    df["_bucket"] = (
+        contains_by_category(df["Reward"], "house") * HOUSE_BUCKET
+        | contains_by_category(df["Reward"], "conduct") * CONDUCT_BUCKET
+    ).astype(np.int8)
     return df
 
 # --- STYLES & HELPERS ---
-def safe_plot(data, x, y, title, text=None, orientation="v", color=None, color_map=None):
-    if data.empty:
-        st.info(f"No data available for {title}")
-        return
+# px.bar validation dominates chart cost; the inputs are small aggregates, so hashing them is cheap
+@st.cache_data(show_spinner=False, max_entries=64)
+def bar_figure(data, x, y, title, text=None, orientation="v", color=None, color_map=None):
+    label, value = (y, x) if orientation == "h" else (x, y)
+    if data[label].nunique() > MAX_BARS:
+        keep = data.groupby(label, observed=True, sort=False)[value].sum().nlargest(MAX_BARS).index
+        data = data[data[label].isin(keep)]
+        title = f"{title} (top {MAX_BARS})"
     fig = px.bar(
         data, x=x, y=y, text=text, orientation=orientation,
         title=title, color=color, color_discrete_map=color_map
     )
     fig.update_traces(texttemplate="%{text}", textposition="outside")
     fig.update_layout(showlegend=False, title=dict(font=dict(size=20)), xaxis_title=None, yaxis_title=None)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
+
+def safe_plot(data, x, y, title, text=None, orientation="v", color=None, color_map=None):
+    if data.empty:
+        st.info(f"No data available for {title}")
+        return
+    st.plotly_chart(bar_figure(data, x, y, title, text, orientation, color, color_map), use_container_width=True)
 
 def header_style_for_house(house_name: str):
     bg = HOUSE_COLORS.get(house_name, "#333")
     text_color = "#000000" if house_name == "Liddell" else "#FFFFFF"
     return [{"selector": "th", "props": f"background-color: {bg}; color: {text_color};"}]
 
-def highlight_staff_target(row):
-    color = "#ccffcc" if row["On Target (≥Target)"] == "✅ Yes" else "#ffcccc"
-    return [f"background-color: {color}"] * len(row)
+def highlight_staff_target(df, target):
+    on_target = df["House Points This Week"].to_numpy() >= target
+    colors = np.where(on_target, "background-color: #ccffcc", "background-color: #ffcccc")
+    return pd.DataFrame(np.broadcast_to(colors[:, None], df.shape), index=df.index, columns=df.columns)
+
+def recode_categories(series, func, categories=None):
+    # apply func once per distinct value, then gather the results back to rows by code
+    cat = series.astype("category")
+    mapped = cat.cat.categories.map(func)
+    target = pd.Index(categories) if categories is not None else mapped.dropna().unique().sort_values()
+    codes = np.append(target.get_indexer(mapped), -1)[cat.cat.codes.to_numpy()]
+    return pd.Categorical.from_codes(codes, categories=target)
+
+def contains_by_category(series, pattern):
+    cat = series.astype("category")
+    matches = np.asarray(cat.cat.categories.str.contains(pattern, regex=False), dtype=bool)
+    # code -1 (missing) picks up the trailing False
+    return np.append(matches, False)[cat.cat.codes.to_numpy()]
+
+def staff_bucket_totals(df):
+    # bincount over the Teacher codes: house points summed and conduct rows counted, one pass per flag bit
+    cat = df["Teacher"].cat
+    codes = cat.codes.to_numpy()
+    flags = df["_bucket"].to_numpy()
+    house = (codes >= 0) & ((flags & HOUSE_BUCKET) != 0)
+    conduct = (codes >= 0) & ((flags & CONDUCT_BUCKET) != 0)
+    n = len(cat.categories)
+    sums = np.bincount(codes[house], weights=df["Points"].to_numpy()[house], minlength=n)
+    return pd.DataFrame({
+        "Teacher": cat.categories,
+        "House Points This Week": sums.astype(np.int64),
+        "Conduct Points This Week": np.bincount(codes[conduct], minlength=n),
+    })
+
+def sum_by_category(data, keys, value=None):
+    # bincount over the combined category codes: one linear pass, no hash table.
+    # With no value column it counts rows instead.
+    keys = [keys] if isinstance(keys, str) else keys
+    cats = [data[k].cat for k in keys]
+    sizes = [len(c.categories) for c in cats]
+    codes = np.zeros(len(data), dtype=np.int64)
+    present = np.ones(len(data), dtype=bool)
+    for c, n in zip(cats, sizes):
+        k = c.codes.to_numpy()
+        present &= k >= 0
+        codes = codes * n + k
+    codes = codes[present]
+    total = int(np.prod(sizes))
+    seen = np.bincount(codes, minlength=total)
+    if value is None:
+        value, sums = "Count", seen
+    else:
+        sums = np.bincount(codes, weights=data[value].to_numpy()[present], minlength=total).astype(np.int64)
+    idx = np.flatnonzero(seen)
+    out = {k: c.categories[pos] for k, c, pos in zip(keys, cats, np.unravel_index(idx, sizes))}
+    out[value] = sums[idx]
+    return pd.DataFrame(out)
+
+def top_n_per_group(data, group, value, n):
+    # an empty groupby nlargest returns a flat index of group labels, not (group, row) pairs
+    if data.empty:
+        return data.iloc[:0]
+    idx = data.groupby(group, observed=True, sort=False)[value].nlargest(n).index.get_level_values(-1)
+    return data.loc[idx]
+
+def house_mode_by_form(data):
+    # most common House per Form; stable sort keeps the first house in category order on ties, like Series.mode
+    counts = data.groupby(["Form","House"], observed=True).size().reset_index(name="n")
+    top = counts.sort_values("n", ascending=False, kind="stable").drop_duplicates("Form")
+    return dict(zip(top["Form"], top["House"]))
+
+def category_cube(data):
+    # award counts per (House, Dep, Category); blank keys are kept so the "All" views still count them
+    return data.groupby(["House","Dep","Category"], observed=True, sort=False, dropna=False).size().reset_index(name="Count")
 
 def title_case_category(series):
     return series.fillna("").astype(str).str.replace("_", " ").str.replace("-", " ").str.title()
 
+# --- AGGREGATES ---
+# Keyed on the upload bytes like load_and_clean, so widget changes reuse every groupby below.
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_aggregates(file_bytes: bytes):
+    df = load_and_clean(file_bytes)
+    # recoding onto the staff list turns non-staff rows into NaN without touching each row,
+    # and lines the Teacher codes up with PERMANENT_STAFF's rows
+    df["Teacher"] = df["Teacher"].cat.set_categories(PERMANENT_STAFF["Teacher"])
+    # each slice keeps only the columns its aggregates and filters read
+    house_df = df.loc[(df["_bucket"] & HOUSE_BUCKET) != 0, ["Pupil Name","House","Form","Year","Category","Dep","Points"]]
+    conduct_df = df.loc[(df["_bucket"] & CONDUCT_BUCKET) != 0, ["Pupil Name","House","Form","Category","Dep"]]
+
+    # per-pupil totals feed both the Top 15 charts and the leaderboards;
+    # the leaderboards group the award rows without Year, so blank Year cells are kept
+    student_house = house_df.groupby(["Pupil Name","Form","Year","House"], observed=True, sort=False, as_index=False)["Points"].sum().rename(columns={"Points":"House Points"})
+    # one row per permanent staff member, zero when they gave no points
+    staff = staff_bucket_totals(df)
+    agg = {
+        "house_cats": category_cube(house_df),
+        "conduct_cats": category_cube(conduct_df),
+        "staff_house": staff[["Teacher","House Points This Week"]],
+        "staff_conduct": staff[["Teacher","Conduct Points This Week"]],
+        "student_house": student_house,
+        "studs": house_df.groupby(["Pupil Name","Form","House"], observed=True, sort=False, as_index=False)["Points"].sum().rename(columns={"Points":"House Points"}),
+        "studs_c": conduct_df.groupby(["Pupil Name","Form","House"], observed=True, sort=False).size().reset_index(name="Conduct Points"),
+        "house_points": sum_by_category(house_df, "House", "Points"),
+        "form_house": sum_by_category(house_df, ["Form","House"], "Points").rename(columns={"Points":"House Points"}),
+        "form_conduct": sum_by_category(conduct_df, ["Form","House"]).rename(columns={"Count":"Conduct Points"}),
+    }
+    # both leaderboard types are ranked here, so the selectbox only picks a cached result
+    agg["leaderboards"] = {
+        "House Points": build_leaderboard(agg["studs"], "House Points"),
+        "Conduct Points": build_leaderboard(agg["studs_c"], "Conduct Points"),
+    }
+    return agg
+
+# --- INTERACTIVE SECTIONS ---
+# Fragments: changing a widget inside one reruns only that section, not the whole analysis.
+@st.fragment
+def category_frequency(cube, heading, key, label_suffix, title, bar_color):
+    st.markdown(heading)
+
+    house_opts = ["All"] + [h for h in HOUSE_NAMES if h in cube["House"].dropna().unique().tolist()]
+    house_filter = st.selectbox(f"Filter by House{label_suffix}:", options=house_opts, key=f"{key}_house")
+    dep_opts = ["All"] + sorted(cube["Dep"].dropna().unique().tolist())
+    dept_filter = st.selectbox(f"Filter by Department{label_suffix}:", options=dep_opts, key=f"{key}_dep")
+
+    # filters slice the small pre-aggregated cube rather than the award rows
+    filtered = cube
+    if house_filter != "All":
+        filtered = filtered[filtered["House"] == house_filter]
+    if dept_filter != "All":
+        filtered = filtered[filtered["Dep"] == dept_filter]
+
+    cat_counts = filtered.groupby("Category", observed=True)["Count"].sum().sort_values(ascending=False, kind="stable")
+    cat_freq = cat_counts[cat_counts > 0].rename_axis("Category").reset_index(name="Count")
+    if len(cat_freq) > MAX_BARS:
+        # same cap as safe_plot; cat_freq is already sorted by count
+        cat_freq = cat_freq.head(MAX_BARS)
+        title = f"{title} (top {MAX_BARS})"
+    cat_freq["Category"] = title_case_category(cat_freq["Category"])
+
+    # rebuilt on every dropdown change, so skip plotly.express and feed the arrays straight to a Bar trace
+    fig = go.Figure(go.Bar(
+        x=cat_freq["Category"].to_numpy(), y=cat_freq["Count"].to_numpy(), text=cat_freq["Count"].to_numpy(),
+        name="", marker_color=bar_color, textposition="outside"
+    ))
+    fig.update_layout(title=title, showlegend=False, xaxis_title=None, yaxis_title=None)
+    st.plotly_chart(fig, use_container_width=True)
+
+def build_leaderboard(data, value):
+    columns = ["Pupil Name","Form","House",value]
+    if data.empty:
+        return {"overall": data, "per_house": {}, "per_form": [], "house_modes": {}}
+    top_per_house = top_n_per_group(data, "House", value, 15)[columns]
+    return {
+        "overall": data.nlargest(15, value),
+        "per_house": dict(list(top_per_house.groupby("House", observed=True, sort=False))),
+        "per_form": list(top_n_per_group(data, "Form", value, 10)[columns].groupby("Form", observed=True, sort=True)),
+        "house_modes": house_mode_by_form(data),
+    }
+
+def leaderboard_expander(label, key, table, house):
+    # tracked expanders rerun the fragment on toggle, so only open ones build a Styler
+    exp = st.expander(label, key=key, on_change="rerun")
+    if exp.open:
+        with exp:
+            styled = table.style.set_table_styles(header_style_for_house(house)).hide(axis="index")
+            st.dataframe(styled, use_container_width=True)
+
+@st.fragment
+def student_leaderboards(leaderboards):
+    st.markdown("---")
+    st.subheader("🏆 Student Leaderboards")
+    lb_type = st.selectbox("Select leaderboard type:", ["House Points", "Conduct Points"])
+
+    value = lb_type
+    key = "studs" if value == "House Points" else "studs_c"
+    board = leaderboards[value]
+
+    st.markdown(f"### 🥇 Top 15 Students — Overall ({value})")
+    st.dataframe(board["overall"], use_container_width=True)
+
+    st.markdown(f"### 🏠 Top 15 Students per House ({value})")
+    for house in HOUSE_NAMES:
+        if house in board["per_house"]:
+            leaderboard_expander(f"{HOUSE_DOT[house]} {house} — Top 15", f"{key}_house_{house}", board["per_house"][house], house)
+
+    st.markdown(f"### 🏫 Top 10 Students per Form ({value})")
+    for form, top in board["per_form"]:
+        house_mode = board["house_modes"].get(form, "")
+        leaderboard_expander(f"{HOUSE_DOT.get(house_mode,'')} Form {form} — Top 10", f"{key}_form_{form}", top, house_mode)
+
 # --- MAIN APP ---
 if uploaded_file is not None:
     try:
-        df = load_and_clean(uploaded_file)
-        df["Teacher"] = df["Teacher"].where(df["Teacher"].isin(PERMANENT_STAFF["Teacher"]), other=np.nan)
-        house_df = df[df["Reward"].str.contains("house", case=False, na=False)].copy()
-        conduct_df = df[df["Reward"].str.contains("conduct", case=False, na=False)].copy()
+        with st.spinner("Analysing upload..."):
+            # reruns for the same upload reuse this session's result instead of unpickling a cache copy
+            file_bytes = uploaded_file.getvalue()
+            upload_key = hashlib.blake2b(file_bytes, digest_size=16).hexdigest()
+            if st.session_state.get("upload_key") != upload_key:
+                st.session_state["analysis"] = build_aggregates(file_bytes)
+                st.session_state["upload_key"] = upload_key
+            agg = st.session_state["analysis"]
+            house_cats, conduct_cats = agg["house_cats"], agg["conduct_cats"]
+            student_house, studs_c = agg["student_house"], agg["studs_c"]
 
         # =========================
         # 🏠 HOUSE POINTS SUMMARY
         # =========================
         st.subheader("🏠 House Points Summary")
 
-        staff_house = PERMANENT_STAFF.merge(
-            house_df.groupby("Teacher")["Points"].sum().reset_index().rename(columns={"Points":"House Points This Week"}),
-            on="Teacher", how="left"
-        ).fillna(0)
-        staff_house["House Points This Week"] = staff_house["House Points This Week"].astype(int)
-        staff_house = staff_house.sort_values("House Points This Week", ascending=False)
-
-        student_house = house_df.groupby(["Pupil Name","Form","Year","House"])["Points"].sum().reset_index().rename(columns={"Points":"House Points"})
-        house_points = house_df.groupby("House")["Points"].sum().reset_index()
-        form_house = house_df.groupby(["Form","House"])["Points"].sum().reset_index().rename(columns={"Points":"House Points"})
-
-        col1, col2 = st.columns(2)
-        with col1:
-            safe_plot(staff_house.head(15), "Teacher", "House Points This Week", "Top 15 Staff (House Points)", "House Points This Week")
-        with col2:
-            safe_plot(student_house.sort_values("House Points", ascending=False).head(15),
-                      "Pupil Name", "House Points", "Top 15 Students (House Points)", "House Points", color="House", color_map=HOUSE_COLORS)
-
-        col3, col4 = st.columns(2)
-        with col3:
-            safe_plot(house_points, "House", "Points", "House Points by House", "Points", color="House", color_map=HOUSE_COLORS)
-        with col4:
-            safe_plot(form_house, "Form", "House Points", "House Points by Form", "House Points", color="House", color_map=HOUSE_COLORS)
-
-        # --- 🏠 Category Frequency ---
-        if not house_df.empty:
-            st.markdown("### 🏅 House Point Category Frequency")
-
-            house_opts = ["All"] + [h for h in HOUSE_NAMES if h in house_df["House"].dropna().unique().tolist()]
-            house_filter = st.selectbox("Filter by House:", options=house_opts, key="house_cat_house")
-            dep_opts = ["All"] + sorted(house_df["Dep"].dropna().unique().tolist())
-            dept_filter = st.selectbox("Filter by Department:", options=dep_opts, key="house_cat_dep")
-
-            filtered_house_df = house_df.copy()
-            if house_filter != "All":
-                filtered_house_df = filtered_house_df[filtered_house_df["House"] == house_filter]
-            if dept_filter != "All":
-                filtered_house_df = filtered_house_df[filtered_house_df["Dep"] == dept_filter]
-
-            house_cat = filtered_house_df.groupby("Category")["Points"].count().reset_index().rename(columns={"Points":"Count"})
-            house_cat["Category"] = title_case_category(house_cat["Category"])
-            house_cat = house_cat.sort_values("Count", ascending=False)
-
-            fig_house_cat = px.bar(
-                house_cat,
-                x="Category", y="Count", text="Count",
-                title="House Categories by Frequency (Descending)",
-                color_discrete_sequence=["#DAA520"]
-            )
-            fig_house_cat.update_traces(textposition="outside")
-            fig_house_cat.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None)
-            st.plotly_chart(fig_house_cat, use_container_width=True)
+        staff_house = agg["staff_house"]
+
+        if render_charts:
+            house_points, form_house = agg["house_points"], agg["form_house"]
+
+            col1, col2 = st.columns(2)
+            with col1:
+                safe_plot(staff_house.nlargest(15, "House Points This Week"), "Teacher", "House Points This Week", "Top 15 Staff (House Points)", "House Points This Week")
+            with col2:
+                safe_plot(student_house.nlargest(15, "House Points"),
+                          "Pupil Name", "House Points", "Top 15 Students (House Points)", "House Points", color="House", color_map=HOUSE_COLORS)
+
+            col3, col4 = st.columns(2)
+            with col3:
+                safe_plot(house_points, "House", "Points", "House Points by House", "Points", color="House", color_map=HOUSE_COLORS)
+            with col4:
+                safe_plot(form_house, "Form", "House Points", "House Points by Form", "House Points", color="House", color_map=HOUSE_COLORS)
+
+            # --- 🏠 Category Frequency ---
+            if not house_cats.empty:
+                category_frequency(
+                    house_cats, "### 🏅 House Point Category Frequency", "house_cat", "",
+                    "House Categories by Frequency (Descending)", "#DAA520"
+                )
+        else:
+            st.caption("Charts are turned off in the sidebar settings.")
 
         # =========================
         # ⚠️ CONDUCT POINTS SUMMARY
         # =========================
         st.subheader("⚠️ Conduct Points Summary")
 
-        staff_conduct = PERMANENT_STAFF.merge(
-            conduct_df.groupby("Teacher")["Points"].count().reset_index().rename(columns={"Points":"Conduct Points This Week"}),
-            on="Teacher", how="left"
-        ).fillna(0)
-        staff_conduct["Conduct Points This Week"] = staff_conduct["Conduct Points This Week"].astype(int)
-        staff_conduct = staff_conduct.sort_values("Conduct Points This Week", ascending=False)
-
-        studs_c = conduct_df.groupby(["Pupil Name","Form","House"])["Points"].count().reset_index().rename(columns={"Points":"Conduct Points"})
-        form_conduct = conduct_df.groupby(["Form","House"])["Points"].count().reset_index().rename(columns={"Points":"Conduct Points"})
-
-        col5, col6 = st.columns(2)
-        with col5:
-            safe_plot(staff_conduct.head(15), "Teacher", "Conduct Points This Week", "Top 15 Staff (Conduct Points)", "Conduct Points This Week")
-        with col6:
-            safe_plot(studs_c.sort_values("Conduct Points", ascending=False).head(15),
-                      "Pupil Name", "Conduct Points", "Top 15 Students (Conduct Points)", "Conduct Points", color="House", color_map=HOUSE_COLORS)
-
-        safe_plot(form_conduct, "Form", "Conduct Points", "Conduct Points by Form", "Conduct Points", color="House", color_map=HOUSE_COLORS)
-
-        # --- ⚠️ Category Frequency ---
-        if not conduct_df.empty:
-            st.markdown("### ⚠️ Conduct Point Category Frequency")
-
-            house_opts_c = ["All"] + [h for h in HOUSE_NAMES if h in conduct_df["House"].dropna().unique().tolist()]
-            house_filter_c = st.selectbox("Filter by House (Conduct):", options=house_opts_c, key="cond_cat_house")
-            dep_opts_c = ["All"] + sorted(conduct_df["Dep"].dropna().unique().tolist())
-            dept_filter_c = st.selectbox("Filter by Department (Conduct):", options=dep_opts_c, key="cond_cat_dep")
-
-            filtered_conduct_df = conduct_df.copy()
-            if house_filter_c != "All":
-                filtered_conduct_df = filtered_conduct_df[filtered_conduct_df["House"] == house_filter_c]
-            if dept_filter_c != "All":
-                filtered_conduct_df = filtered_conduct_df[filtered_conduct_df["Dep"] == dept_filter_c]
-
-            conduct_cat = filtered_conduct_df.groupby("Category")["Points"].count().reset_index().rename(columns={"Points":"Count"})
-            conduct_cat["Category"] = title_case_category(conduct_cat["Category"])
-            conduct_cat = conduct_cat.sort_values("Count", ascending=False)
-
-            fig_conduct_cat = px.bar(
-                conduct_cat,
-                x="Category", y="Count", text="Count",
-                title="Conduct Categories by Frequency (Descending)",
-                color_discrete_sequence=["#800080"]
-            )
-            fig_conduct_cat.update_traces(textposition="outside")
-            fig_conduct_cat.update_layout(showlegend=False, xaxis_title=None, yaxis_title=None)
-            st.plotly_chart(fig_conduct_cat, use_container_width=True)
+        if render_charts:
+            staff_conduct, form_conduct = agg["staff_conduct"], agg["form_conduct"]
+
+            col5, col6 = st.columns(2)
+            with col5:
+                safe_plot(staff_conduct.nlargest(15, "Conduct Points This Week"), "Teacher", "Conduct Points This Week", "Top 15 Staff (Conduct Points)", "Conduct Points This Week")
+            with col6:
+                safe_plot(studs_c.nlargest(15, "Conduct Points"),
+                          "Pupil Name", "Conduct Points", "Top 15 Students (Conduct Points)", "Conduct Points", color="House", color_map=HOUSE_COLORS)
+
+            safe_plot(form_conduct, "Form", "Conduct Points", "Conduct Points by Form", "Conduct Points", color="House", color_map=HOUSE_COLORS)
+
+            # --- ⚠️ Category Frequency ---
+            if not conduct_cats.empty:
+                category_frequency(
+                    conduct_cats, "### ⚠️ Conduct Point Category Frequency", "cond_cat", " (Conduct)",
+                    "Conduct Categories by Frequency (Descending)", "#800080"
+                )
+        else:
+            st.caption("Charts are turned off in the sidebar settings.")
 
         # =========================
         # 🏆 LEADERBOARDS
         # =========================
-        st.markdown("---")
-        st.subheader("🏆 Student Leaderboards")
-        lb_type = st.selectbox("Select leaderboard type:", ["House Points", "Conduct Points"])
-
-        if lb_type == "House Points":
-            studs = house_df.groupby(["Pupil Name","Form","House"], as_index=False)["Points"].sum().rename(columns={"Points":"House Points"})
-            st.markdown("### 🥇 Top 15 Students — Overall (House Points)")
-            st.dataframe(studs.sort_values("House Points", ascending=False).head(15), use_container_width=True)
-
-            st.markdown("### 🏠 Top 15 Students per House (House Points)")
-            for house in HOUSE_NAMES:
-                hdf = studs[studs["House"] == house].sort_values("House Points", ascending=False).head(15)
-                if not hdf.empty:
-                    with st.expander(f"{HOUSE_DOT[house]} {house} — Top 15"):
-                        styled = hdf[["Pupil Name","Form","House","House Points"]].style.set_table_styles(header_style_for_house(house)).hide(axis="index")
-                        st.dataframe(styled, use_container_width=True)
-
-            st.markdown("### 🏫 Top 10 Students per Form (House Points)")
-            for form, g in studs.groupby("Form"):
-                g_sorted = g.sort_values("House Points", ascending=False).head(10)
-                house_mode = g["House"].mode().iloc[0] if not g["House"].mode().empty else ""
-                with st.expander(f"{HOUSE_DOT.get(house_mode,'')} Form {form} — Top 10"):
-                    styled = g_sorted[["Pupil Name","Form","House","House Points"]].style.set_table_styles(header_style_for_house(house_mode)).hide(axis="index")
-                    st.dataframe(styled, use_container_width=True)
-
-        else:
-            studs_c = conduct_df.groupby(["Pupil Name","Form","House"], as_index=False)["Points"].count().rename(columns={"Points":"Conduct Points"})
-            st.markdown("### 🥇 Top 15 Students — Overall (Conduct Points)")
-            st.dataframe(studs_c.sort_values("Conduct Points", ascending=False).head(15), use_container_width=True)
-
-            st.markdown("### 🏠 Top 15 Students per House (Conduct Points)")
-            for house in HOUSE_NAMES:
-                hdf = studs_c[studs_c["House"] == house].sort_values("Conduct Points", ascending=False).head(15)
-                if not hdf.empty:
-                    with st.expander(f"{HOUSE_DOT[house]} {house} — Top 15"):
-                        styled = hdf[["Pupil Name","Form","House","Conduct Points"]].style.set_table_styles(header_style_for_house(house)).hide(axis="index")
-                        st.dataframe(styled, use_container_width=True)
-
-            st.markdown("### 🏫 Top 10 Students per Form (Conduct Points)")
-            for form, g in studs_c.groupby("Form"):
-                g_sorted = g.sort_values("Conduct Points", ascending=False).head(10)
-                house_mode = g["House"].mode().iloc[0] if not g["House"].mode().empty else ""
-                with st.expander(f"{HOUSE_DOT.get(house_mode,'')} Form {form} — Top 10"):
-                    styled = g_sorted[["Pupil Name","Form","House","Conduct Points"]].style.set_table_styles(header_style_for_house(house_mode)).hide(axis="index")
-                    st.dataframe(styled, use_container_width=True)
+        student_leaderboards(agg["leaderboards"])
 
         # =========================
         # 👩‍🏫 STAFF SUMMARY
         # =========================
         st.markdown("---")
         st.subheader("📅 Weekly Staff Summary (House Points)")
-        summary_df = PERMANENT_STAFF.merge(staff_house[["Teacher","House Points This Week"]], on="Teacher", how="left").fillna(0)
-        summary_df["House Points This Week"] = summary_df["House Points This Week"].astype(int)
-        summary_df["On Target (≥Target)"] = np.where(summary_df["House Points This Week"] >= int(target_input), "✅ Yes", "⚠️ No")
-        styled_staff = summary_df.sort_values("House Points This Week", ascending=False).style.apply(highlight_staff_target, axis=1)
+        # only the target column depends on the sidebar; the totals come from the cache
+        summary_df = staff_house.assign(**{
+            "On Target (≥Target)": np.where(staff_house["House Points This Week"] >= int(target_input), "✅ Yes", "⚠️ No")
+        })
+        styled_staff = summary_df.sort_values("House Points This Week", ascending=False).style.apply(highlight_staff_target, axis=None, target=int(target_input))
         st.dataframe(styled_staff, use_container_width=True)
 
     except Exception as e: